@@ -1,3 +1,22 @@
+import json
+import logging
+import mmap
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Initialise the logger
+log = logging.getLogger(__name__)
+
+# Marks the line of the web_summary.html holding the report data as JSON
+CONST_DATA_PREFIX = b"const data = "
+
+# Background colours for the warnings tables, shared by all alarm headers
+FAIL_BGCOLS = {"FAIL": "#f06807"}
+
+
 def clean_title_case(col_id):
     title = col_id.title() if col_id[0:1].islower() else col_id
     for str in ["Bc", "bc", "Umi", "Igk", "Igh", "Igl", "Vj", "q30"]:
@@ -16,13 +35,15 @@ def update_dict(table, headers, rows_list, col_map, colours, prefix):
             col_data = col_data.replace(",", "").replace("%", "")
 
             # Convert to float when possible
-            try:
-                col_data = float(col_data)
-            except ValueError:
-                col_data = col_data
+            col_data = str_to_float(col_data)
 
             col_id = col_map[col_name]
             table[col_id] = col_data
+
+            # Only build each header once, unless this sample shows that the
+            # column holds percentages and the existing header doesn't know it yet
+            if col_id in headers and (not is_percentage or headers[col_id].get("suffix") == "%"):
+                continue
             headers[col_id] = {
                 "rid": "{}_{}".format(prefix, col_id.replace(" ", "_").replace("/", "_")),
                 "title": clean_title_case(col_id),
@@ -50,6 +71,59 @@ def update_dict(table, headers, rows_list, col_map, colours, prefix):
     return table, headers
 
 
+def str_to_float(value):
+    """Convert a value to float, leaving it untouched if it is not numeric"""
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def parse_const_data(path):
+    """Find the `const data = {...}` line in a web_summary.html and return the decoded JSON.
+
+    The file is memory-mapped so that we can jump straight to the data line
+    without decoding the rest of the (potentially very large) HTML.
+    """
+    try:
+        with open(path, "rb") as fh:
+            try:
+                mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file
+                return None
+            with mm:
+                # Only accept the marker at the start of a line (after any indentation)
+                pos = mm.find(CONST_DATA_PREFIX)
+                while pos != -1:
+                    line_start = mm.rfind(b"\n", 0, pos) + 1
+                    if not mm[line_start:pos].strip():
+                        break
+                    pos = mm.find(CONST_DATA_PREFIX, pos + 1)
+                if pos == -1:
+                    return None
+                start = pos + len(CONST_DATA_PREFIX)
+                end = mm.find(b"\n", start)
+                if end == -1:
+                    end = len(mm)
+                line = mm[start:end].rstrip().rstrip(b";")
+    except OSError as e:
+        log.debug("Couldn't read file: {}\n{}".format(path, e))
+        return None
+    return json_loads(line)
+
+
+def json_loads(s):
+    """Decode JSON with orjson when available, falling back to the stdlib
+    for anything orjson rejects (e.g. NaN / Infinity literals)"""
+    if orjson is not None:
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(s)
+
+
 def set_hidden_cols(headers, col_names):
     """Set the hidden columns"""
 
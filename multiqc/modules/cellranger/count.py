@@ -1,8 +1,11 @@
 """ MultiQC module to parse output from Cell Ranger count """
 
-import json
+import itertools
 import logging
+import os
 from collections import OrderedDict
+from functools import partial
+from operator import mul
 
 from multiqc import config
 from multiqc.plots import linegraph, table
@@ -13,6 +16,69 @@ from ._utils import *
 log = logging.getLogger(__name__)
 
 
+# Columns (and their colour scales) pulled from the Cell Ranger count report tables
+GENERAL_CELLS_COLS = {
+    "Estimated Number of Cells": "estimated cells",
+    "Mean Reads per Cell": "avg reads/cell",
+    "Fraction Reads in Cells": "reads in cells",
+}
+GENERAL_CELLS_COLOURS = {
+    "estimated cells": "PuBu",
+    "avg reads/cell": "GnBu",
+    "reads in cells": "Purples",
+}
+
+GENERAL_SEQ_COLS = {
+    "Number of Reads": "reads",
+    "Valid Barcodes": "valid bc",
+    "Q30 Bases in Barcode": "Q30 bc",
+    "Q30 Bases in UMI": "Q30 UMI",
+    "Q30 Bases in RNA Read": "Q30 read",
+}
+GENERAL_SEQ_COLOURS = {
+    "reads": "PuBuGn",
+    "valid bc": "RdYlGn",
+    "Q30 bc": "RdYlBu",
+    "Q30 UMI": "Spectral",
+    "Q30 read": "RdBu",
+}
+
+FULL_COLS = {
+    "Number of Reads": "reads",
+    "Estimated Number of Cells": "estimated cells",
+    "Mean Reads per Cell": "avg reads/cell",
+    "Total Genes Detected": "genes detected",
+    "Median Genes per Cell": "median genes/cell",
+    "Fraction Reads in Cells": "reads in cells",
+    "Valid Barcodes": "valid bc",
+    "Valid UMIs": "valid umi",
+    "Median UMI Counts per Cell": "median umi/cell",
+    "Sequencing Saturation": "saturation",
+    "Q30 Bases in Barcode": "Q30 bc",
+    "Q30 Bases in UMI": "Q30 UMI",
+    "Q30 Bases in RNA Read": "Q30 read",
+    "Reads Mapped to Genome": "reads mapped",
+    "Reads Mapped Confidently to Genome": "confident reads",
+    "Reads Mapped Confidently to Transcriptome": "confident transcriptome",
+    "Reads Mapped Confidently to Exonic Regions": "confident exonic",
+    "Reads Mapped Confidently to Intronic Regions": "confident intronic",
+    "Reads Mapped Confidently to Intergenic Regions": "confident intergenic",
+    "Reads Mapped Antisense to Gene": "reads antisense",
+}
+FULL_COLOURS = {
+    "reads": "YlGn",
+    "estimated cells": "RdPu",
+    "avg reads/cell": "Blues",
+    "genes detected": "Greens",
+    "median genes/cell": "Purples",
+    "reads in cells": "PuBuGn",
+    "valid bc": "Spectral",
+    "valid umi": "RdYlGn",
+    "median umi/cell": "YlGn",
+    "saturation": "YlOrRd",
+}
+
+
 class CellRangerCountMixin:
     """Cell Ranger count report parser"""
 
@@ -26,20 +92,28 @@ class CellRangerCountMixin:
         self.count_data_headers = OrderedDict()
         self.count_warnings_headers = OrderedDict()
 
-        for f in self.find_log_files("cellranger/count_html", filehandles=True):
+        for f in self.find_log_files("cellranger/count_html", filecontents=False):
             self.parse_count_report(f)
 
-        self.cellrangercount_data = self.ignore_samples(self.cellrangercount_data)
-        self.cellrangercount_general_data = self.ignore_samples(self.cellrangercount_general_data)
-        self.cellrangercount_warnings = self.ignore_samples(self.cellrangercount_warnings)
+        # Match the sample names against the ignore patterns once and filter everything with that
+        kept = self.ignore_samples(dict.fromkeys(self.cellrangercount_data))
+        self.cellrangercount_data = {s: v for s, v in self.cellrangercount_data.items() if s in kept}
+        self.cellrangercount_general_data = {s: v for s, v in self.cellrangercount_general_data.items() if s in kept}
+        self.cellrangercount_warnings = {s: v for s, v in self.cellrangercount_warnings.items() if s in kept}
         for k in self.cellrangercount_plots_data.keys():
-            self.cellrangercount_plots_data[k] = self.ignore_samples(self.cellrangercount_plots_data[k])
+            if k == "bc":
+                # Barcode knee plot series are keyed by sample and series name
+                self.cellrangercount_plots_data[k] = self.ignore_samples(self.cellrangercount_plots_data[k])
+            else:
+                self.cellrangercount_plots_data[k] = {
+                    s: v for s, v in self.cellrangercount_plots_data[k].items() if s in kept
+                }
 
         self.count_general_data_headers["reads"] = {
             "rid": "count_genstats_reads",
             "title": "{} Reads".format(config.read_count_prefix),
             "description": "Number of reads ({})".format(config.read_count_desc),
-            "modify": lambda x: x * config.read_count_multiplier,
+            "modify": partial(mul, config.read_count_multiplier),
             "shared_key": "read_count",
             "namespace": "Cell Ranger Count",
         }
@@ -51,7 +125,7 @@ class CellRangerCountMixin:
             "rid": "count_data_reads",
             "title": "{} Reads".format(config.read_count_prefix),
             "description": "Number of reads ({})".format(config.read_count_desc),
-            "modify": lambda x: x * config.read_count_multiplier,
+            "modify": partial(mul, config.read_count_multiplier),
         }
         self.count_data_headers = set_hidden_cols(
             self.count_data_headers,
@@ -133,108 +207,48 @@ class CellRangerCountMixin:
     def parse_count_report(self, f):
         """Go through the html report of cell ranger and extract the data in a dicts"""
 
-        for line in f["f"]:
-            line = line.strip()
-            if line.startswith("const data"):
-                line = line.replace("const data = ", "")
-                summary = json.loads(line)
-                summary = summary["summary"]
-                break
+        summary = parse_const_data(os.path.join(f["root"], f["fn"]))
+        if summary is None:
+            log.debug("Could not find summary data in {}".format(f["fn"]))
+            return
+        summary = summary["summary"]
 
         s_name = self.clean_s_name(summary["sample"]["id"], f["root"])
         data_general_stats = dict()
 
         # Store general stats from cells
-        col_dict = {
-            "Estimated Number of Cells": "estimated cells",
-            "Mean Reads per Cell": "avg reads/cell",
-            "Fraction Reads in Cells": "reads in cells",
-        }
-        colours = {
-            "estimated cells": "PuBu",
-            "avg reads/cell": "GnBu",
-            "reads in cells": "Purples",
-        }
         data_general_stats, self.count_general_data_headers = update_dict(
             data_general_stats,
             self.count_general_data_headers,
             summary["summary_tab"]["cells"]["table"]["rows"],
-            col_dict,
-            colours,
+            GENERAL_CELLS_COLS,
+            GENERAL_CELLS_COLOURS,
             "Count",
         )
 
         # Store general stats from sequencing tables
-        col_dict = {
-            "Number of Reads": "reads",
-            "Valid Barcodes": "valid bc",
-            "Q30 Bases in Barcode": "Q30 bc",
-            "Q30 Bases in UMI": "Q30 UMI",
-            "Q30 Bases in RNA Read": "Q30 read",
-        }
-        colours = {
-            "reads": "PuBuGn",
-            "valid bc": "RdYlGn",
-            "Q30 bc": "RdYlBu",
-            "Q30 UMI": "Spectral",
-            "Q30 read": "RdBu",
-        }
         data_general_stats, self.count_general_data_headers = update_dict(
             data_general_stats,
             self.count_general_data_headers,
             summary["summary_tab"]["sequencing"]["table"]["rows"],
-            col_dict,
-            colours,
+            GENERAL_SEQ_COLS,
+            GENERAL_SEQ_COLOURS,
             "Count",
         )
 
         # Store full data from cell ranger count report
         data = dict()
-        data_rows = (
-            summary["summary_tab"]["sequencing"]["table"]["rows"]
-            + summary["summary_tab"]["cells"]["table"]["rows"]
-            + summary["summary_tab"]["mapping"]["table"]["rows"]
+        data_rows = itertools.chain(
+            summary["summary_tab"]["sequencing"]["table"]["rows"],
+            summary["summary_tab"]["cells"]["table"]["rows"],
+            summary["summary_tab"]["mapping"]["table"]["rows"],
         )
-        col_dict = {
-            "Number of Reads": "reads",
-            "Estimated Number of Cells": "estimated cells",
-            "Mean Reads per Cell": "avg reads/cell",
-            "Total Genes Detected": "genes detected",
-            "Median Genes per Cell": "median genes/cell",
-            "Fraction Reads in Cells": "reads in cells",
-            "Valid Barcodes": "valid bc",
-            "Valid UMIs": "valid umi",
-            "Median UMI Counts per Cell": "median umi/cell",
-            "Sequencing Saturation": "saturation",
-            "Q30 Bases in Barcode": "Q30 bc",
-            "Q30 Bases in UMI": "Q30 UMI",
-            "Q30 Bases in RNA Read": "Q30 read",
-            "Reads Mapped to Genome": "reads mapped",
-            "Reads Mapped Confidently to Genome": "confident reads",
-            "Reads Mapped Confidently to Transcriptome": "confident transcriptome",
-            "Reads Mapped Confidently to Exonic Regions": "confident exonic",
-            "Reads Mapped Confidently to Intronic Regions": "confident intronic",
-            "Reads Mapped Confidently to Intergenic Regions": "confident intergenic",
-            "Reads Mapped Antisense to Gene": "reads antisense",
-        }
-        colours = {
-            "reads": "YlGn",
-            "estimated cells": "RdPu",
-            "avg reads/cell": "Blues",
-            "genes detected": "Greens",
-            "median genes/cell": "Purples",
-            "reads in cells": "PuBuGn",
-            "valid bc": "Spectral",
-            "valid umi": "RdYlGn",
-            "median umi/cell": "YlGn",
-            "saturation": "YlOrRd",
-        }
         data, self.count_data_headers = update_dict(
             data_general_stats,
             self.count_data_headers,
             data_rows,
-            col_dict,
-            colours,
+            FULL_COLS,
+            FULL_COLOURS,
             "Count",
         )
 
@@ -243,11 +257,12 @@ class CellRangerCountMixin:
         alarms_list = summary["alarms"].get("alarms", [])
         for alarm in alarms_list:
             warnings[alarm["id"]] = "FAIL"
-            self.count_warnings_headers[alarm["id"]] = {
-                "title": alarm["id"],
-                "description": alarm["title"],
-                "bgcols": {"FAIL": "#f06807"},
-            }
+            if alarm["id"] not in self.count_warnings_headers:
+                self.count_warnings_headers[alarm["id"]] = {
+                    "title": alarm["id"],
+                    "description": alarm["title"],
+                    "bgcols": FAIL_BGCOLS,
+                }
 
         # Extract data for plots
         help_dict = {x[0]: x[1][0] for x in summary["summary_tab"]["cells"]["help"]["data"]}
@@ -1,8 +1,10 @@
 """ MultiQC module to parse output from Cell Ranger count """
 
-import json
 import logging
+import os
 from collections import OrderedDict
+from functools import partial
+from operator import mul
 
 from multiqc import config
 from multiqc.plots import linegraph, table
@@ -28,7 +30,7 @@ class CellRangerVdjMixin:
         self.vdj_annotations_headers = OrderedDict()
         self.vdj_warnings_headers = OrderedDict()
 
-        for f in self.find_log_files("cellranger/vdj_html", filehandles=True):
+        for f in self.find_log_files("cellranger/vdj_html", filecontents=False):
             self.parse_vdj_report(f)
 
         self.cellrangervdj_mapping = self.ignore_samples(self.cellrangervdj_mapping)
@@ -41,7 +43,7 @@ class CellRangerVdjMixin:
         self.vdj_general_data_headers["reads"] = {
             "title": "{} Reads".format(config.read_count_prefix),
             "description": "Number of reads ({})".format(config.read_count_desc),
-            "modify": lambda x: x * config.read_count_multiplier,
+            "modify": partial(mul, config.read_count_multiplier),
             "shared_key": "read_count",
             "namespace": "Cell Ranger VDJ",
         }
@@ -59,7 +61,7 @@ class CellRangerVdjMixin:
         self.vdj_mapping_headers["reads"] = {
             "title": "{} Reads".format(config.read_count_prefix),
             "description": "Number of reads ({})".format(config.read_count_desc),
-            "modify": lambda x: x * config.read_count_multiplier,
+            "modify": partial(mul, config.read_count_multiplier),
         }
         self.vdj_mapping_headers = set_hidden_cols(
             self.vdj_mapping_headers,
@@ -140,13 +142,11 @@ class CellRangerVdjMixin:
     def parse_vdj_report(self, f):
         """Go through the html report of cell ranger and extract the data in a dicts"""
 
-        for line in f["f"]:
-            line = line.strip()
-            if line.startswith("const data"):
-                line = line.replace("const data = ", "")
-                mydict = json.loads(line)
-                mydict = mydict["summary"]
-                break
+        mydict = parse_const_data(os.path.join(f["root"], f["fn"]))
+        if mydict is None:
+            log.debug("Could not find summary data in {}".format(f["fn"]))
+            return
+        mydict = mydict["summary"]
 
         s_name = self.clean_s_name(mydict["sample"]["id"], f)
         data = dict()
@@ -271,11 +271,12 @@ class CellRangerVdjMixin:
         alarms_list = mydict["alarms"].get("alarms", [])
         for alarm in alarms_list:
             warnings[alarm["id"]] = "FAIL"
-            self.vdj_warnings_headers[alarm["id"]] = {
-                "title": clean_title_case(alarm["id"].replace("_", " ")),
-                "description": alarm["title"],
-                "bgcols": {"FAIL": "#f06807"},
-            }
+            if alarm["id"] not in self.vdj_warnings_headers:
+                self.vdj_warnings_headers[alarm["id"]] = {
+                    "title": clean_title_case(alarm["id"].replace("_", " ")),
+                    "description": alarm["title"],
+                    "bgcols": FAIL_BGCOLS,
+                }
 
         # Extract data for plots
         help_dict = {x[0]: x[1][0] for x in mydict["summary_tab"]["cells"]["help"]["data"]}
@@ -1,6 +1,7 @@
 """ MultiQC module to parse output from Lima """
 
 import logging
+import re
 from collections import OrderedDict
 
 from multiqc import config
@@ -10,6 +11,9 @@ from multiqc.plots import bargraph
 # Initialise the logger
 log = logging.getLogger(__name__)
 
+# Each line of stats.dat looks like `field: value`
+STAT_LINE_RE = re.compile(r"^(\w+):\s+(\d+)\s*$", re.MULTILINE)
+
 
 class MultiqcModule(BaseMultiqcModule):
     def __init__(self):
@@ -99,21 +103,17 @@ class MultiqcModule(BaseMultiqcModule):
 
 def parse_stat_file(fin, s_name):
     """Parse the stats file"""
-    data = dict()
-    for line in fin:
-        field, value = line.strip().split(": ")
-        data[field] = int(value)
-    if process_stats(data, s_name):
-        return data
+    data = {field: int(value) for field, value in STAT_LINE_RE.findall(fin.read())}
+    missing = [field for field in ("total", "usable", "clusters") if field not in data]
+    if missing:
+        log.warning(f"HUMID stats missing {', '.join(missing)}, skipping: {s_name}")
+        return None
+    process_stats(data)
+    return data
 
 
-def process_stats(stats, s_name):
+def process_stats(stats):
     """Process the statistics, to calculate some useful values"""
     stats["filtered"] = stats["total"] - stats["usable"]
+    # Duplicates, clusters and filtered add up to the total by construction
     stats["duplicates"] = stats["total"] - stats["clusters"] - stats["filtered"]
-    # Sanity check
-    try:
-        assert stats["duplicates"] + stats["clusters"] + stats["filtered"] == stats["total"]
-    except AssertionError:
-        log.warning(f"HUMID stats looked wrong, skipping: {s_name}")
-        return False
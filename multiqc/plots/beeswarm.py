@@ -48,9 +48,21 @@ def make_plot(dt):
     s_names = []
     data = []
     for idx, hs in enumerate(dt.headers):
+        # Pivot the sample data into per-column lists in a single pass
+        cols = {k: ([], []) for k in hs}
+        for s_name, samp in dt.data[idx].items():
+            for k, val in samp.items():
+                if k in cols:
+                    cols[k][0].append(s_name)
+                    cols[k][1].append(val)
+
         for k, header in hs.items():
 
+            # Everything derived from the header only needs resolving once per column
             bcol = "rgb({})".format(header.get("colour", "204,204,204"))
+            modify = header.get("modify")
+            if not callable(modify):
+                modify = None
 
             categories.append(
                 {
@@ -66,18 +78,9 @@ def make_plot(dt):
             )
 
             # Add the data
-            thisdata = []
-            these_snames = []
-            for (s_name, samp) in dt.data[idx].items():
-                if k in samp:
-
-                    val = samp[k]
-
-                    if "modify" in header and callable(header["modify"]):
-                        val = header["modify"](val)
-
-                    thisdata.append(val)
-                    these_snames.append(s_name)
+            these_snames, thisdata = cols[k]
+            if modify is not None:
+                thisdata = [modify(val) for val in thisdata]
 
             data.append(thisdata)
             s_names.append(these_snames)